@@ -0,0 +1,113 @@
+# benchmark_search.py
+# Compares the cluster-routed search against the exhaustive FAISS search,
+# which is used as ground truth, at growing corpus sizes.
+#
+#   python benchmarks/benchmark_search.py --sizes 1200 10000 50000
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from corpus import synthesize_corpus
+
+# app.py loads papers.csv from the working directory
+WEBAPP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'webapp')
+os.chdir(WEBAPP_DIR)
+sys.path.insert(0, WEBAPP_DIR)
+import app as search_app
+
+
+def run_queries(queries, top_k, **search_options):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vector_dense = search_app.encode_query(query, "")
+        _, indices = search_app.search_index(query_vector_dense, top_k, **search_options)
+        latencies.append(time.perf_counter() - start)
+        results.append(indices[0])
+    return np.array(latencies) * 1000, results
+
+
+def check_cluster_routing(queries, top_k):
+    # With every cluster probed the routed search must match the exhaustive one
+    n_clusters = len(search_app.cluster_bounds) - 1
+    for query in queries:
+        query_vector_dense = search_app.encode_query(query, "")
+        expected_scores, expected_ids = search_app.faiss_index.search(query_vector_dense, top_k)
+        for rescore in (False, True):
+            scores, ids = search_app.cluster_search(query_vector_dense, top_k, nprobe=n_clusters, rescore=rescore)
+            assert np.allclose(scores, expected_scores, atol=1e-6), query
+            # Papers tied at the last score may be returned in either order
+            untied = expected_scores[0] > expected_scores[0][-1] + 1e-6
+            assert set(expected_ids[0][untied]) <= set(ids[0]), query
+            assert len(set(ids[0])) == top_k, query
+
+    # nprobe=0 still probes the nearest cluster
+    scores, ids = search_app.cluster_search(query_vector_dense, top_k, nprobe=0)
+    assert np.array_equal(ids, search_app.cluster_search(query_vector_dense, top_k, nprobe=1)[1])
+
+    # A top_k larger than the probed clusters returns each of their papers once
+    _, probed = search_app.cluster_centroid_index.search(query_vector_dense, 2)
+    bounds = search_app.cluster_bounds
+    expected = np.concatenate([search_app.cluster_row_ids[bounds[cluster]:bounds[cluster + 1]]
+                               for cluster in probed[0]])
+    _, ids = search_app.cluster_search(query_vector_dense, len(search_app.df) + 1, nprobe=2)
+    assert sorted(ids[0]) == sorted(expected)
+
+
+def recall_at_k(results, ground_truth, top_k):
+    hits = [len(set(found) & set(expected)) for found, expected in zip(results, ground_truth)]
+    return float(np.mean(hits)) / top_k
+
+
+def benchmark(base_df, sizes, nprobes, n_queries, top_k):
+    # Real paper titles are used as queries
+    rng = np.random.default_rng(1)
+    queries = base_df['clean_title'].astype(str).to_numpy()[rng.integers(0, len(base_df), n_queries)]
+
+    rows = []
+    for size in sizes:
+        search_app.df = base_df if size == len(base_df) else synthesize_corpus(base_df, size)
+        search_app.initialize_search_engine()
+        check_cluster_routing(queries[:20], top_k)
+
+        latencies, ground_truth = run_queries(queries, top_k, search_mode='exhaustive')
+        rows.append({'papers': size, 'mode': 'exhaustive', 'nprobe': '-', 'rescore': '-',
+                     'recall': 1.0, 'mean_ms': latencies.mean(), 'p95_ms': np.percentile(latencies, 95)})
+
+        for nprobe in nprobes:
+            for rescore in (False, True):
+                latencies, results = run_queries(queries, top_k, search_mode='cluster',
+                                                 nprobe=nprobe, rescore=rescore)
+                rows.append({'papers': size, 'mode': 'cluster', 'nprobe': nprobe, 'rescore': rescore,
+                             'recall': recall_at_k(results, ground_truth, top_k),
+                             'mean_ms': latencies.mean(), 'p95_ms': np.percentile(latencies, 95)})
+
+        print(f"Finished corpus of {size} papers")
+
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency vs. recall of cluster-routed search")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1200, 10000, 50000])
+    parser.add_argument('--nprobes', type=int, nargs='+', default=[1, 2, 3, 5])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+
+    base_df = search_app.load_dataset()
+    if 'cluster' not in base_df.columns:
+        print("papers.csv with a cluster column is required for this benchmark")
+        return
+
+    report = benchmark(base_df, args.sizes, args.nprobes, args.queries, args.top_k)
+    print(report.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+
+
+if __name__ == '__main__':
+    main()
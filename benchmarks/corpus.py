@@ -0,0 +1,32 @@
+# corpus.py
+# Synthetic corpora for the benchmarks, built from papers.csv.
+import numpy as np
+import pandas as pd
+
+
+def synthesize_corpus(base_df, n_papers, seed=0):
+    # Build a larger corpus from papers.csv: every synthetic paper mixes the
+    # words of a source paper with those of a partner drawn from the whole
+    # dataset and keeps the source's cluster. Partners from other clusters
+    # pull some papers away from their label, as in the real data.
+    rng = np.random.default_rng(seed)
+    texts = [str(title) + " " + str(description) for title, description in zip(base_df['clean_title'], base_df['description'])]
+
+    sources = rng.integers(0, len(base_df), n_papers)
+    partners = rng.integers(0, len(base_df), n_papers)
+    titles, descriptions = [], []
+    for source, partner in zip(sources, partners):
+        words = (texts[source] + " " + texts[partner]).split()
+        keep = rng.random(len(words)) > 0.3
+        words = [word for word, kept in zip(words, keep) if kept]
+        split = max(1, len(words) // 4)
+        titles.append(" ".join(words[:split]))
+        descriptions.append(" ".join(words[split:]))
+
+    return pd.DataFrame({
+        'clean_title': titles,
+        'description': descriptions,
+        'citations': base_df['citations'].to_numpy()[sources],
+        'cluster': base_df['cluster'].to_numpy()[sources],
+        'category': base_df['category'].to_numpy()[sources],
+    })
@@ -0,0 +1,361 @@
+# run.py
+# Offline benchmark and regression suite for scrape -> build -> serve.
+#
+#   scrape: GoogleScholarScraper against saved Scholar pages from a local stub server
+#   build:  initialize_search_engine on synthetic corpora of growing size
+#   serve:  query loads replayed against /api/search through Flask's test client
+#
+# Every case runs in a fresh process so its peak memory is its own. Scrape and
+# build times are the fastest of at least --repeat runs spread over 10 seconds,
+# serve metrics come from the fastest pass after a warmup.
+#
+#   python benchmarks/run.py --output benchmarks/results/latest.json
+#   python benchmarks/run.py --baseline benchmarks/baseline.json
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from corpus import synthesize_corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+SCRAPING_DIR = os.path.join(ROOT, 'src', 'scraping')
+WEBAPP_DIR = os.path.join(ROOT, 'src', 'webapp')
+
+# Queries sent before the serve clock starts
+WARMUP_QUERIES = 50
+
+# Short scrape and build cases keep repeating until this much time has passed,
+# so their fastest run is not taken from a single slow spell of the machine
+MIN_TIMED_SECONDS = 10
+
+# Relative slowdown tolerated per kind of metric. Each is set above the spread
+# seen between clean runs of an unchanged tree on a shared single-core VM:
+# up to 76% for scrape and build times, 47% for serve p50 and 1% for memory.
+TIME_TOLERANCE = 1.0
+LATENCY_TOLERANCE = 0.75
+MEMORY_TOLERANCE = 0.1
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        # resource is not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+# Run at least repeat times and for MIN_TIMED_SECONDS, return the fastest time
+# and the last result
+def fastest_run(run, repeat):
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat or time.perf_counter() - started < MIN_TIMED_SECONDS:
+        start = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def metric(value, unit, tolerance=None, higher_is_better=False):
+    # Metrics without a tolerance are recorded but never fail a comparison
+    return {'value': value, 'unit': unit, 'tolerance': tolerance, 'higher_is_better': higher_is_better}
+
+
+# Scrape
+
+def start_stub_server(pages):
+    # Serve the saved Scholar pages in rotation based on the start parameter
+    class ScholarHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            start = int(parse_qs(urlparse(self.path).query).get('start', ['0'])[0])
+            body = pages[(start // 10) % len(pages)]
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=UTF-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ScholarHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_scrape(num_articles, repeat):
+    os.environ['TQDM_DISABLE'] = '1'
+    sys.path.insert(0, SCRAPING_DIR)
+
+    pages = []
+    for name in sorted(os.listdir(FIXTURES)):
+        if name.endswith('.html'):
+            with open(os.path.join(FIXTURES, name), 'rb') as f:
+                pages.append(f.read())
+
+    # index.py logs to ./log, so run it from a scratch directory
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, 'log'))
+        os.chdir(workdir)
+        import index as scraping
+
+        server = start_stub_server(pages)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/scholar?q=benchmark&hl=en"
+        try:
+            def scrape():
+                scraper = scraping.GoogleScholarScraper()
+                # The random delays are rate limiting for the real site, not scraper work
+                with mock.patch.object(scraping.time, 'sleep'), contextlib.redirect_stdout(io.StringIO()):
+                    return scraper.scrape_multiple_pages(base_url, num_articles=num_articles)
+
+            elapsed, df = fastest_run(scrape, repeat)
+        finally:
+            server.shutdown()
+            # Close the scraper's log file before the directory is removed
+            logging.shutdown()
+            os.chdir(ROOT)
+
+    return {
+        'scrape.seconds': metric(elapsed, 's', TIME_TOLERANCE),
+        'scrape.articles_per_second': metric(len(df) / elapsed, 'articles/s', higher_is_better=True),
+        'scrape.peak_rss_mb': metric(peak_rss_mb(), 'MB', MEMORY_TOLERANCE),
+    }
+
+
+# Build
+
+def import_webapp():
+    # app.py loads papers.csv from the working directory
+    os.chdir(WEBAPP_DIR)
+    sys.path.insert(0, WEBAPP_DIR)
+    import app as search_app
+    return search_app
+
+
+def bench_build(size, repeat):
+    search_app = import_webapp()
+    search_app.df = synthesize_corpus(search_app.load_dataset(), size)
+
+    elapsed, _ = fastest_run(search_app.initialize_search_engine, repeat)
+
+    return {
+        f'build.{size}.seconds': metric(elapsed, 's', TIME_TOLERANCE),
+        f'build.{size}.peak_rss_mb': metric(peak_rss_mb(), 'MB', MEMORY_TOLERANCE),
+    }
+
+
+# Serve
+
+# Search options replayed per serve case
+SERVE_CASES = {
+    'exhaustive': {'searchMode': 'exhaustive'},
+    'cluster': {'searchMode': 'cluster', 'nProbe': 3},
+    'cluster_rescore': {'searchMode': 'cluster', 'nProbe': 3, 'rescore': True},
+}
+
+
+def replay_queries(client, titles, num_queries, options):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(num_queries):
+        payload = {'queryTitle': titles[i * 7 % len(titles)], 'topK': 10, **options}
+        query_start = time.perf_counter()
+        response = client.post('/api/search', json=payload)
+        latencies.append((time.perf_counter() - query_start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/search returned {response.status_code}: {response.get_json()}")
+        if response.get_json()['searchMode'] != options['searchMode']:
+            raise RuntimeError(f"/api/search ran {response.get_json()['searchMode']} instead of {options['searchMode']}")
+    elapsed = time.perf_counter() - start
+    return latencies, num_queries / elapsed
+
+
+def serve_scope(size):
+    return str(size) if size else 'papers_csv'
+
+
+def bench_serve(size, num_queries, repeat):
+    search_app = import_webapp()
+    base_df = search_app.load_dataset()
+    if size:
+        search_app.df = synthesize_corpus(base_df, size)
+        search_app.initialize_search_engine()
+
+    titles = base_df['clean_title'].astype(str).tolist()
+    client = search_app.app.test_client()
+    for options in SERVE_CASES.values():
+        replay_queries(client, titles, WARMUP_QUERIES, options)
+
+    # Interleave the passes of every case so a slow spell of the machine does
+    # not land on all passes of one case, then keep each case's fastest pass
+    best = {}
+    for _ in range(repeat):
+        for case, options in SERVE_CASES.items():
+            latencies, throughput = replay_queries(client, titles, num_queries, options)
+            if case not in best or throughput > best[case][1]:
+                best[case] = (latencies, throughput)
+
+    prefix = f'serve.{serve_scope(size)}'
+    results = {}
+    for case, (latencies, throughput) in best.items():
+        results[f'{prefix}.{case}.p50_ms'] = metric(percentile(latencies, 50), 'ms', LATENCY_TOLERANCE)
+        # Tail latency and throughput swing too much between clean runs to gate on
+        results[f'{prefix}.{case}.p95_ms'] = metric(percentile(latencies, 95), 'ms')
+        results[f'{prefix}.{case}.queries_per_second'] = metric(throughput, 'queries/s', higher_is_better=True)
+
+    results[f'{prefix}.peak_rss_mb'] = metric(peak_rss_mb(), 'MB', MEMORY_TOLERANCE)
+    return results
+
+
+# Runner
+
+def run_isolated(function, *args):
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(function, *args).result()
+
+
+def build_sizes(args):
+    return args.sizes + [1000000] if args.large else args.sizes
+
+
+def has_cluster_labels():
+    # The synthetic corpora inherit the clusters of papers.csv
+    path = os.path.join(WEBAPP_DIR, 'papers.csv')
+    return os.path.exists(path) and 'cluster' in pd.read_csv(path, nrows=0).columns
+
+
+def run_benchmarks(args):
+    results = {}
+    if 'scrape' in args.stages:
+        print(f"Scraping {args.articles} articles from the stub server")
+        results.update(run_isolated(bench_scrape, args.articles, args.repeat))
+    if 'build' in args.stages:
+        for size in build_sizes(args):
+            print(f"Building the search engine for {size} papers")
+            results.update(run_isolated(bench_build, size, args.repeat))
+    if 'serve' in args.stages:
+        for size in args.serve_sizes:
+            print(f"Replaying {args.queries} queries per case on {size or 'papers.csv'}")
+            results.update(run_isolated(bench_serve, size, args.queries, args.repeat))
+    return results
+
+
+def was_selected(name, args):
+    # Whether this run's --stages, --sizes and --serve-sizes cover a metric
+    stage, scope = name.split('.')[:2]
+    if stage not in args.stages:
+        return False
+    if stage == 'build':
+        return scope in [str(size) for size in build_sizes(args)]
+    if stage == 'serve':
+        return scope in [serve_scope(size) for size in args.serve_sizes]
+    return True
+
+
+def compare(results, baseline, threshold, args):
+    # A metric regresses when it is worse than the baseline by more than its
+    # own tolerance, or by more than threshold when one is given
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None or current['value'] is None or not previous['value']:
+            continue
+        change = (current['value'] - previous['value']) / previous['value']
+        if current['higher_is_better']:
+            change = -change
+        tolerance = current['tolerance'] if threshold is None else threshold
+        if current['tolerance'] is None:
+            status = 'info'
+        else:
+            status = 'REGRESSION' if change > tolerance else 'ok'
+        limit = '' if status == 'info' else f", limit {tolerance:.0%}"
+        print(f"{status:<10} {name:<50} {previous['value']:>12.3f} -> {current['value']:>12.3f} "
+              f"{current['unit']:<10} ({change:+.1%} worse{limit})")
+        if status == 'REGRESSION':
+            regressions.append(name)
+
+    # Baseline metrics this run should have produced point at a renamed or
+    # dropped case; the others were left out by a narrower selection
+    for name in sorted(set(baseline) - set(results)):
+        if was_selected(name, args):
+            print(f"{'MISSING':<10} {name}")
+            regressions.append(name)
+        else:
+            print(f"{'skipped':<10} {name}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for scrape -> build -> serve")
+    parser.add_argument('--stages', nargs='+', choices=['scrape', 'build', 'serve'],
+                        default=['scrape', 'build', 'serve'])
+    parser.add_argument('--articles', type=int, default=1000, help="articles to scrape")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                        help="synthetic corpus sizes for the build stage")
+    parser.add_argument('--large', action='store_true',
+                        help="also build a 1M paper corpus, which needs roughly 20 GB of RAM")
+    parser.add_argument('--serve-sizes', type=int, nargs='+', default=[0, 100000],
+                        help="corpus sizes for the serve stage, 0 for papers.csv as shipped")
+    parser.add_argument('--queries', type=int, default=500, help="queries replayed per serve case")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="runs per case, the fastest one is kept")
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results', 'latest.json'))
+    parser.add_argument('--baseline', help="results file to compare against")
+    parser.add_argument('--threshold', type=float,
+                        help="relative slowdown tolerated for every metric, overriding their own tolerances")
+    args = parser.parse_args()
+
+    if {'build', 'serve'} & set(args.stages) and not has_cluster_labels():
+        print("papers.csv with a cluster column is required for the build and serve stages")
+        sys.exit(1)
+
+    results = run_benchmarks(args)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold, args)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed or went missing")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 from flask import Flask, request, jsonify, render_template, send_from_directory
 import pandas as pd
 import faiss
+import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 import os
 import json
@@ -88,8 +89,26 @@ tfidf_vectorizer = None
 tfidf_matrix = None
 faiss_index = None
 
+# Global variables for cluster-routed search. The index stores the vectors
+# sorted by precomputed cluster, so each cluster's posting list is a contiguous
+# range of rows. Centroids and representatives are built on the first cluster
+# request.
+cluster_row_ids = None
+cluster_bounds = None
+cluster_centroid_index = None
+cluster_representatives = None
+cluster_representative_owners = None
+
+# Sub-centroids kept per cluster to re-score candidate clusters
+CLUSTER_REPRESENTATIVES = 16
+
+# How many candidate clusters per probed cluster are re-scored in cluster mode
+RESCORE_FACTOR = 4
+
 def initialize_search_engine():
     global tfidf_vectorizer, tfidf_matrix, faiss_index
+    global cluster_row_ids, cluster_bounds, cluster_centroid_index
+    global cluster_representatives, cluster_representative_owners
     
     # Combine title and description for each paper
     corpus = [str(row['clean_title']) + " " + str(row['description']) for _, row in df.iterrows()]
@@ -98,20 +117,79 @@ def initialize_search_engine():
     tfidf_vectorizer = TfidfVectorizer(stop_words='english', max_features=1024)
     tfidf_matrix = tfidf_vectorizer.fit_transform(corpus)
     
-    # Create FAISS index
-    faiss_index = faiss.IndexFlatIP(tfidf_matrix.shape[1])
-    
     # Convert sparse matrix to dense and normalize
     vectors = tfidf_matrix.toarray().astype('float32')
     faiss.normalize_L2(vectors)
-    faiss_index.add(vectors)
+    
+    # Sort the rows by cluster so cluster search can scan contiguous ranges
+    # of the same vectors the exhaustive search uses
+    labels = get_cluster_labels()
+    if labels is None:
+        # Without cluster labels only the exhaustive search is available
+        cluster_row_ids = np.arange(len(vectors), dtype='int64')
+        cluster_bounds = None
+    else:
+        codes, uniques = pd.factorize(labels)
+        cluster_row_ids = np.argsort(codes, kind='stable').astype('int64')
+        cluster_bounds = np.searchsorted(codes[cluster_row_ids], np.arange(len(uniques) + 1))
+        vectors = vectors[cluster_row_ids]
+    
+    # Create FAISS index, reporting the original row of every vector
+    faiss_index = faiss.IndexIDMap(faiss.IndexFlatIP(vectors.shape[1]))
+    faiss_index.add_with_ids(vectors, cluster_row_ids)
+    
+    cluster_centroid_index = None
+    cluster_representatives = None
+    cluster_representative_owners = None
+
+def get_cluster_labels():
+    # Prefer the precomputed clusters, fall back to the scraped category
+    for column in ('cluster', 'category'):
+        if column in df.columns and df[column].notna().all():
+            return df[column].to_numpy()
+    return None
+
+def get_index_vectors():
+    # View of the vectors stored in the FAISS index, without copying them
+    flat_index = faiss.downcast_index(faiss_index.index)
+    return faiss.rev_swig_ptr(flat_index.get_xb(), flat_index.ntotal * flat_index.d).reshape(
+        flat_index.ntotal, flat_index.d)
+
+def initialize_cluster_index():
+    global cluster_centroid_index, cluster_representatives, cluster_representative_owners
+    
+    vectors = get_index_vectors()
+    n_clusters = len(cluster_bounds) - 1
+    dimension = vectors.shape[1]
+    centroids = np.zeros((n_clusters, dimension), dtype='float32')
+    representatives = []
+    owners = []
+    
+    for cluster in range(n_clusters):
+        members = vectors[cluster_bounds[cluster]:cluster_bounds[cluster + 1]]
+        centroids[cluster] = members.mean(axis=0)
+        
+        # A single mean is a coarse summary of a cluster, so also keep a few
+        # sub-centroids that re-scoring can compare the query against
+        kmeans = faiss.Kmeans(dimension, min(CLUSTER_REPRESENTATIVES, len(members)),
+                              niter=10, spherical=True, seed=1, min_points_per_centroid=1)
+        kmeans.train(members)
+        representatives.append(kmeans.centroids)
+        owners.append(np.full(len(kmeans.centroids), cluster))
+    
+    # Centroids are normalized so routing uses the same cosine similarity
+    faiss.normalize_L2(centroids)
+    centroid_index = faiss.IndexFlatIP(dimension)
+    centroid_index.add(centroids)
+    
+    cluster_representatives = np.vstack(representatives).astype('float32')
+    cluster_representative_owners = np.concatenate(owners)
+    cluster_centroid_index = centroid_index
 
 # Initialize the search engine when the app starts
 initialize_search_engine()
 
-def recommend_papers(query_title, query_description, top_k=5):
-    global tfidf_vectorizer, faiss_index, df
-    
+def encode_query(query_title, query_description):
     # Combine query title and description
     query_text = str(query_title) + " " + str(query_description)
    
@@ -121,9 +199,72 @@ def recommend_papers(query_title, query_description, top_k=5):
     # Convert to dense array and normalize
     query_vector_dense = query_vector.toarray().astype('float32')
     faiss.normalize_L2(query_vector_dense)
+    return query_vector_dense
+
+def cluster_search(query_vector_dense, top_k, nprobe=3, rescore=False):
+    if cluster_centroid_index is None:
+        initialize_cluster_index()
+    
+    # At least one cluster is always probed
+    n_clusters = cluster_centroid_index.ntotal
+    nprobe = max(1, min(int(nprobe), n_clusters))
+    
+    # Route the query to the nearest clusters, considering extra candidate
+    # clusters when they are going to be re-scored
+    n_candidates = min(nprobe * RESCORE_FACTOR, n_clusters) if rescore else nprobe
+    _, candidates = cluster_centroid_index.search(query_vector_dense, n_candidates)
+    probed = candidates[0]
+    
+    if rescore:
+        # Re-score the candidate clusters by their closest sub-centroid
+        representative_scores = cluster_representatives @ query_vector_dense[0]
+        cluster_scores = np.full(n_clusters, -np.inf, dtype='float32')
+        np.maximum.at(cluster_scores, cluster_representative_owners, representative_scores)
+        order = np.argsort(-cluster_scores[probed], kind='stable')
+        probed = probed[order]
+    probed = probed[:nprobe]
+    
+    # Search only the posting lists of the probed clusters
+    vectors = get_index_vectors()
+    candidate_scores = []
+    candidate_ids = []
+    for cluster in probed:
+        start, end = cluster_bounds[cluster], cluster_bounds[cluster + 1]
+        k = int(min(top_k, end - start))
+        scores, positions = faiss.knn(query_vector_dense, vectors[start:end], k,
+                                      metric=faiss.METRIC_INNER_PRODUCT)
+        candidate_scores.append(scores[0])
+        candidate_ids.append(cluster_row_ids[start + positions[0]])
+    
+    scores = np.concatenate(candidate_scores)
+    ids = np.concatenate(candidate_ids)
+    order = np.argsort(-scores, kind='stable')[:top_k]
+    return scores[np.newaxis, order], ids[np.newaxis, order]
+
+# Search modes accepted by /api/search
+SEARCH_MODES = ('exhaustive', 'cluster')
+
+def resolve_search_mode(search_mode):
+    if search_mode == 'cluster' and cluster_bounds is None:
+        print("Cluster search requested without cluster labels, using exhaustive search")
+        return 'exhaustive'
+    return search_mode
+
+def search_index(query_vector_dense, top_k, search_mode='exhaustive', nprobe=3, rescore=False):
+    # search_mode is expected to be resolved already
+    if search_mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {search_mode}")
+    if search_mode == 'cluster' and cluster_bounds is not None:
+        return cluster_search(query_vector_dense, top_k, nprobe, rescore)
+    return faiss_index.search(query_vector_dense, top_k)
+
+def recommend_papers(query_title, query_description, top_k=5, search_mode='exhaustive', nprobe=3, rescore=False):
+    global tfidf_vectorizer, faiss_index, df
+    
+    query_vector_dense = encode_query(query_title, query_description)
    
     # Search the index
-    distances, indices = faiss_index.search(query_vector_dense, top_k)
+    distances, indices = search_index(query_vector_dense, top_k, search_mode, nprobe, rescore)
     
     # Prepare results
     results = []
@@ -152,6 +293,12 @@ def recommend_papers(query_title, query_description, top_k=5):
 def index():
     return render_template('index.html')
 
+def bad_request(message):
+    return jsonify({
+        'success': False,
+        'error': message
+    }), 400
+
 @app.route('/api/search', methods=['POST'])
 def search():
     try:
@@ -159,11 +306,24 @@ def search():
         query_title = data.get('queryTitle', '')
         query_description = data.get('queryDescription', '')
         top_k = min(int(data.get('topK', 5)), 20)  # Limit to max 20 results
+        search_mode = data.get('searchMode', 'exhaustive')
+        nprobe = data.get('nProbe', 3)
+        rescore = data.get('rescore', False)
+        
+        # Reject malformed search options as client errors
+        if search_mode not in SEARCH_MODES:
+            return bad_request(f"searchMode must be one of: {', '.join(SEARCH_MODES)}")
+        if not isinstance(nprobe, int) or isinstance(nprobe, bool) or nprobe < 0:
+            return bad_request("nProbe must be a non-negative integer")
+        if not isinstance(rescore, bool):
+            return bad_request("rescore must be true or false")
+        search_mode = resolve_search_mode(search_mode)
         
-        results = recommend_papers(query_title, query_description, top_k)
+        results = recommend_papers(query_title, query_description, top_k, search_mode, nprobe, rescore)
         
         return jsonify({
             'success': True,
+            'searchMode': search_mode,
             'results': results
         })
     except Exception as e: